@@ -1,11 +1,55 @@
+import json
+import os
 import streamlit as st
+import numpy as np
 import pandas as pd
 import altair as alt
 from st_aggrid import GridOptionsBuilder, AgGrid, GridUpdateMode, ColumnsAutoSizeMode
 
+# only the columns the dashboard displays or charts
+DASHBOARD_COLUMNS = ["Position", "Name", "Salary", "Game Info", "TeamAbbrev", "Proj DFS Total",
+                     "Pass Yds DFS", "Pass TDs DFS", "Int DFS", "Rush Yds DFS", "Rec Yds DFS", "Rec DFS", "TDs DFS"]
+DASHBOARD_DTYPES = {"Salary": np.int32, "Position": "category", "TeamAbbrev": "category"}
+
+@st.cache_data(ttl=3600)
+def load_dashboard(week_str: str) -> pd.DataFrame:
+    # parsed once per week, reused across reruns
+    return pd.read_csv(f"2024/{week_str}/dashboard.csv",
+                       usecols=lambda c: c in DASHBOARD_COLUMNS,
+                       dtype=DASHBOARD_DTYPES,
+                       index_col="Name")
+
+@st.cache_data(ttl=3600)
+def load_box_score(week_str: str) -> pd.DataFrame:
+    # older weeks saved the total as "Act DFS Total", newer ones as "DFS Total"
+    df = pd.read_csv(f"2024/{week_str}/box_score_debug.csv", usecols=lambda c: c != "Unnamed: 0", index_col="Name")
+    return df.rename(columns={"DFS Total": "Act DFS Total"})
+
+@st.cache_data
+def grid_options(columns_df: pd.DataFrame) -> dict:
+    # only the columns and dtypes matter, so callers pass an empty frame to keep hashing cheap
+    gb = GridOptionsBuilder.from_dataframe(columns_df)
+    # configure selection
+    gb.configure_selection(selection_mode="single", use_checkbox=True)
+
+    gb.configure_default_column(
+        flex=1,
+        minWidth=100,
+        maxWidth=500,
+        resizable=True,
+        filter=True
+    )
+    # the builder nests defaultdicts, round-trip through JSON so the cache can pickle it
+    return json.loads(json.dumps(gb.build()))
+
 def chart_data(data, name):
-    #transform dataframe 
-    source=pd.melt(data, id_vars=[name], value_name="Points")
+    #transform dataframe to long form, one block of rows per variable like pd.melt
+    variables = [c for c in data.columns if c != name]
+    source = pd.DataFrame({
+        name: np.tile(data[name].to_numpy(), len(variables)),
+        "variable": np.repeat(variables, len(data)),
+        "Points": data[variables].to_numpy().ravel(order="F")
+        })
 
     chart = alt.Chart(source).mark_bar().encode(
         column=alt.Column(name, title=""),
@@ -18,28 +62,29 @@ def chart_data(data, name):
     
     return chart
 
-def position_data(position:str, sel_row: pd.DataFrame, past_week:bool, last_week_df=None):
-    column_names = {
-        "WR": ["Receiving Yards", "Receptions", "Touchdowns"],
-        "RB": ["Rushing Yards", "Receiving Yards", "Receptions", "Touchdowns"],
-        "QB": ["Passing Yards", "Passing TD", "Interceptions", "Rushing Yards", "Rushing TD"]
-        }
-    
-    proj_columns = {
-        "WR": ["Rec Yds DFS", "Rec DFS", "TDs DFS"],
-        "RB": ["Rush Yds DFS", "Rec Yds DFS", "Rec DFS", "TDs DFS"],
-        "QB": ["Pass Yds DFS", "Pass TDs DFS", "Int DFS", "Rush Yds DFS", "TDs DFS"]
-        }
-    act_or_last_columns = {
-        "WR": ["rec_Yds", 'rec_Rec', 'rec_TD'],
-        "RB": ["rush_Yds", "rec_Yds", 'rec_Rec', 'rec_TD'],
-        "QB": ["pass_Yds", "pass_TD", "pass_INT", "rush_Yds", "rush_TD"]
-        }
+_COLUMN_NAMES = {
+    "WR": ["Receiving Yards", "Receptions", "Touchdowns"],
+    "RB": ["Rushing Yards", "Receiving Yards", "Receptions", "Touchdowns"],
+    "QB": ["Passing Yards", "Passing TD", "Interceptions", "Rushing Yards", "Rushing TD"]
+    }
 
+_PROJ_COLUMNS = {
+    "WR": ["Rec Yds DFS", "Rec DFS", "TDs DFS"],
+    "RB": ["Rush Yds DFS", "Rec Yds DFS", "Rec DFS", "TDs DFS"],
+    "QB": ["Pass Yds DFS", "Pass TDs DFS", "Int DFS", "Rush Yds DFS", "TDs DFS"]
+    }
+
+_ACT_COLUMNS = {
+    "WR": ["rec_Yds", 'rec_Rec', 'rec_TD'],
+    "RB": ["rush_Yds", "rec_Yds", 'rec_Rec', 'rec_TD'],
+    "QB": ["pass_Yds", "pass_TD", "pass_INT", "rush_Yds", "rush_TD"]
+    }
+
+def position_data(position:str, sel_row: pd.DataFrame, past_week:bool, last_week_df=None):
     if past_week:
-        first_column = column_names[position]
-        second_column = [sel_row[k].iloc[0] for k in proj_columns[position]]
-        third_column = [sel_row[k].iloc[0] for k in act_or_last_columns[position]]
+        first_column = _COLUMN_NAMES[position]
+        second_column = sel_row[_PROJ_COLUMNS[position]].iloc[0].to_numpy()
+        third_column = sel_row[_ACT_COLUMNS[position]].iloc[0].to_numpy()
         data = pd.DataFrame({
         position: first_column,
         "Projected": second_column,
@@ -47,12 +92,12 @@ def position_data(position:str, sel_row: pd.DataFrame, past_week:bool, last_week
         })
     
     else:
-        last_week_row = last_week_df[last_week_df["Name"] == sel_row.iloc[0,3]]
+        last_week_row = last_week_df[last_week_df.index == sel_row["Name"].iloc[0]]
         try:
-            first_column = column_names[position]
-            second_column = [sel_row[k].iloc[0] for k in proj_columns[position]]
+            first_column = _COLUMN_NAMES[position]
+            second_column = sel_row[_PROJ_COLUMNS[position]].iloc[0].to_numpy()
             if position != "RB":
-                third_column = [last_week_row[k].iloc[0] for k in act_or_last_columns[position]]
+                third_column = last_week_row[_ACT_COLUMNS[position]].iloc[0].to_numpy()
             else:
                 third_column = [last_week_row["rush_Yds"].iloc[0], last_week_row["rec_Yds"].iloc[0], last_week_row["rec_Rec"].iloc[0], (last_week_row["rec_TD"].iloc[0] + last_week_row["rush_TD"].iloc[0])]
             print(first_column)
@@ -75,9 +120,9 @@ def position_data(position:str, sel_row: pd.DataFrame, past_week:bool, last_week
                     "Last Week": third_column
                     })
                 except:
-                    st.write(f"Last week data for {sel_row.iloc[0,3]} not available")
+                    st.write(f"Last week data for {sel_row['Name'].iloc[0]} not available")
             except:
-                st.write(f"Projected data for {sel_row.iloc[0,3]} not available yet")
+                st.write(f"Projected data for {sel_row['Name'].iloc[0]} not available yet")
     return data
     
 
@@ -94,26 +139,26 @@ week_str = st.sidebar.selectbox("Pick your Week", [f"WEEK{x}" for x in range(1,5
 week = int(week_str[4:])
 
 # df_proj = pd.read_csv(f"2024/{week}/NFL_Proj_DFS.csv")
-df_debug = pd.read_csv(f"2024/{week_str}/dashboard.csv")
-df_debug["Value"] = round((df_debug["Proj DFS Total"] / df_debug["Salary"]) * 1000, 2)
+df_debug = load_dashboard(week_str)
+df_debug["Value"] = np.round(np.multiply(df_debug["Proj DFS Total"].to_numpy(), 1000.0 / df_debug["Salary"].to_numpy()), 2)
 # df_debug = pd.merge(df_debug, df_proj, how="left", on="Name")
 
 # figure out if the week is in the past or future
-try:
-    df_box_score = pd.read_csv(f"2024/{week_str}/box_score_debug.csv")
-    df = pd.merge(df_debug, df_box_score, how="left", on="Name")
-    df = df.rename(columns={"DFS Total": "Act DFS Total"})
+box_path = f"2024/{week_str}/box_score_debug.csv"
+past_week = os.path.exists(box_path)
+if past_week:
+    df_box_score = load_box_score(week_str)
+    # both frames are keyed by Name, so this aligns on the index
+    df = df_debug.join(df_box_score, how="left").reset_index()
     df["Net"] = df["Proj DFS Total"] - df["Act DFS Total"]
     df = df.round({"Net": 2, "Proj DFS Total": 2})
     display_df = df[["Position", "Name", "Salary", "TeamAbbrev", "Proj DFS Total", "Act DFS Total", "Net"]]
-    past_week = True
     last_week_df = None
-except:
-    df = df_debug
+else:
+    df = df_debug.reset_index()
     df = df.round({"Proj DFS Total": 2})
     display_df = df[["Position", "Name", "Salary","Game Info", "TeamAbbrev", "Proj DFS Total", "Value"]]
-    past_week = False
-    last_week_df = pd.read_csv(f"2024/WEEK{week-1}/box_score_debug.csv")
+    last_week_df = load_box_score(f"WEEK{week-1}")
     print("box score not available yet")
 
 
@@ -122,18 +167,7 @@ st.subheader(f"Week {week} Player Pool Summary")
 
 with st.container(height=500):
     # select the columns you want the users to see
-    gb = GridOptionsBuilder.from_dataframe(display_df)
-    # configure selection
-    gb.configure_selection(selection_mode="single", use_checkbox=True)
-
-    gb.configure_default_column(
-        flex=1,
-        minWidth=100,
-        maxWidth=500,
-        resizable=True,
-        filter=True
-    )
-    gridOptions = gb.build()
+    gridOptions = grid_options(display_df.head(0))
 
     data = AgGrid(df,
                 gridOptions=gridOptions,
@@ -149,7 +183,7 @@ if data["selected_rows"] is not None:
     else:
         sel_row = data["selected_rows"]
 
-    position = sel_row.iloc[0,1]
+    position = sel_row["Position"].iloc[0]
     selected_data = position_data(position, sel_row, past_week, last_week_df)
     
     chart = chart_data(selected_data, position)
@@ -1,63 +1,118 @@
 import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
 from selenium import webdriver
-from bs4 import BeautifulSoup
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+import lxml.etree
+import lxml.html
+import os
+import re
 import sys
+import queue
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 import numpy as np
 import argparse
-from dfs_stack import fix_name
+from dfs_stack import fix_names
+
+BASE_URL = "https://www.footballdb.com"
+PASS_COLUMNS = ["player", "pass_Yds", "pass_TD", "pass_INT"]
+RUSH_COLUMNS = ["player", "rush_Yds", "rush_TD"]
+REC_COLUMNS = ["player", "rec_Rec", "rec_Yds", "rec_TD"]
+# the first six tables of a box score, one per team for each stat type, and the cells read from each
+STAT_TABLES = ["passing", "passing", "rushing", "rushing", "receiving", "receiving"]
+STAT_FIELDS = {"passing": ["Yds", "TD", "Int"], "rushing": ["Yds", "TD"], "receiving": ["Rec", "Yds", "TD"]}
+WAIT_TIMEOUT = 30
+GAMES_LOCATOR = (By.CSS_SELECTOR, "table.statistics")
+STATS_TABLES_LOCATOR = (By.CSS_SELECTOR, "#divBox_stats table")
+# XPath queries compiled once at import, for the games index and the box score pages
+GAME_TABLES_XPATH = lxml.etree.XPath('//table[contains(concat(" ", normalize-space(@class), " "), " statistics ")]')
+ROWS_XPATH = lxml.etree.XPath('.//tr')
+LINK_XPATH = lxml.etree.XPath('.//a[@href]')
+STATS_XPATH = lxml.etree.XPath('//*[@id="divBox_stats"]//table')
+HEADERS_XPATH = lxml.etree.XPath('(.//thead)[1]//th')
+BODY_ROWS_XPATH = lxml.etree.XPath('(.//tbody)[1]//tr')
+CELLS_XPATH = lxml.etree.XPath('.//td')
+REQUEST_TIMEOUT = 10
+# box score links end in the kickoff date and a game number, e.g. ...-2024090801
+GAME_DATE = re.compile(r"(\d{8})\d{2}$")
+# every game is over by the end of the day after its kickoff date, overtime and time zones included
+FINAL_AFTER = timedelta(days=1)
+FETCH_WORKERS = 10
+# players whose dotted surname the initials split can't undo, by first name
+SPECIAL_PLAYERS = {"Amon-Ra": "Amon-Ra St. Brown", "Equanimeous": "Equanimeous St. Brown"}
+USER_AGENT = ("Mozilla/5.0 (Windows NT 10.0; Win64; x64; rv:128.0) "
+              "Gecko/20100101 Firefox/128.0")
+
+# DraftKings points per unit of each stat
+DK_POINTS = {
+    "pass_Yds": 0.04,  # 25 pass yds = 1
+    "pass_TD": 4,
+    "pass_INT": -1,
+    "rush_Yds": 0.1,  # 10 rush yds = 1
+    "rush_TD": 6,
+    "rec_Rec": 1,
+    "rec_Yds": 0.1,  # 10 rec yds = 1
+    "rec_TD": 6,
+}
+# a 300+ pass yd or 100+ rush/rec yd game is worth 3 more
+DK_BONUS_YARDS = {"pass_Yds": 300, "rush_Yds": 100, "rec_Yds": 100}
 
 def dk_scoring(col, key):
-    match key:
-        case "pass_Yds":
-            '''
-            25 pass yds = 1 (0.04/yd)
-            300+ yd game = 3 
-            '''
-            total = int(col) * 0.04
-            if int(col) >= 300:
-                total += 3
-            return total
-        case "pass_TD":
-            # pass TD = 4
-            return int(col) * 4
-        case "pass_INT":
-            # INT = -1
-            return int(col) * -1
-        case "rush_Yds":
-            '''
-            10 rush yds = 1
-            100+ rush game = 3
-            '''
-            total = int(col) * 0.1
-            if int(col) >= 100:
-                total += 3
-            return total
-        case "rush_TD":
-            # Rush TD = 6
-            return int(col) * 6
-        case "rec_Rec":
-            # Rec = 1
-            return int(col)
-        case "rec_Yds":
-            '''
-            10 rec yds = 1
-            100+ rec game = 3
-            '''
-            total = int(col) * 0.1
-            if int(col) >= 100:
-                total += 3
-            return total
-        case "rec_TD":
-            # rec TD = 6
-            return int(col) * 6
+    '''DraftKings points for one stat cell, the scalar form of calculate_dfs_points'''
+    value = int(col)
+    total = value * DK_POINTS[key]
+    if key in DK_BONUS_YARDS and value >= DK_BONUS_YARDS[key]:
+        total += 3
+    return total
+
+def clean_players(names):
+    '''fix_player for a whole Series of raw name cells at once'''
+    names = names.astype(object)
+    # "First LastF. Last": everything before the first "." minus the trailing initial
+    players = names.str.split(".", n=1).str[0].str[:-1]
+    # names with their own dots drop the last segment, tidy the spaces around the dots
+    # and drop the initial glued to the final part
+    dotted = names.str.count(r"\.") > 1
+    if dotted.any():
+        head = names[dotted].str.rsplit(".", n=1).str[0].str.replace(r"\s*\.\s*", ".", regex=True).str.strip()
+        parts = head.str.rsplit(".", n=1)
+        players[dotted] = (parts.str[0] + ". " + parts.str[1].str[:-1]).str.strip()
+    special = names.str.split(" ", n=1).str[0].map(SPECIAL_PLAYERS)
+    return players.where(special.isna(), special)
+
+def calculate_dfs_points(df):
+    '''
+    Convert the raw stat columns to DraftKings points in place, with the same rules
+    as dk_scoring, and add their sum as DFS Total
+    '''
+    col_of_interets = list(DK_POINTS)
+    # a game's stats fit in int16 and its points in float32, half the width of the defaults;
+    # stat_frame has already made every stat cell an integer
+    stats = df[col_of_interets].to_numpy(np.int16)
+
+    # points per unit for each column, plus the yardage bonuses
+    points = stats * np.array(list(DK_POINTS.values()), dtype=np.float32)
+    bonus = [col_of_interets.index(key) for key in DK_BONUS_YARDS]
+    points[:, bonus] += np.where(stats[:, bonus] >= list(DK_BONUS_YARDS.values()), 3, 0)
+
+    df[col_of_interets] = points
+    # touchdowns, interceptions and receptions score whole points
+    whole = [i for i, key in enumerate(col_of_interets) if isinstance(DK_POINTS[key], int)]
+    df[[col_of_interets[i] for i in whole]] = points[:, whole].astype(np.int16)
+    df["DFS Total"] = points.sum(axis=1)
+    return df
 
 def fix_player(player):
+    '''Player name from one raw name cell, the scalar form of clean_players'''
+    special = SPECIAL_PLAYERS.get(player.split(" ", 1)[0])
+    if special is not None:
+        return special
     split_player = player.split(".")
     if len(split_player) > 2:
-        if split_player[0] == "Amon-Ra":
-            player = "Amon-Ra St. Brown"
-        elif split_player[0] == "Equanimeous":
-            player = "Equanimeous St. Brown"
         split_player = split_player[:-1]
         split_player = [s.strip() for s in split_player]
         initials = split_player[:-1]
@@ -67,89 +122,277 @@ def fix_player(player):
     return player
 
 
-def main(argv):
-    argParser = argparse.ArgumentParser()
-    argParser.add_argument("week", type=int, help="NFL Week")
-    args = argParser.parse_args()
-    WEEK = args.week
-    pass_columns = ["player", "pass_Yds", "pass_TD", "pass_INT"]
-    rush_columns = ["player", "rush_Yds", "rush_TD"]
-    rec_columns = ["player", "rec_Rec", "rec_Yds", "rec_TD"]
-    pass_df = pd.DataFrame(columns=pass_columns)
-    rush_df = pd.DataFrame(columns=rush_columns)
-    rec_df = pd.DataFrame(columns=rec_columns)
-
-    url = 'https://www.footballdb.com/games/index.html'
-    driver = webdriver.Firefox()
-    driver.get(url)
-    driver.implicitly_wait(120)
-    result = driver.page_source
-    soup = BeautifulSoup(result, "html.parser")
-
-    data = soup.find_all()
-    data = soup.find_all('table', class_='statistics')
-    games = data[WEEK-1].find_all('tr')
+def setup_driver():
+    '''Start a headless Firefox, nothing on the pages needs to be rendered on screen'''
+    options = webdriver.FirefoxOptions()
+    options.add_argument("-headless")
+    # hand control back at DOMContentLoaded, the explicit waits cover the stats tables
+    options.page_load_strategy = "eager"
+    # the scraper only reads the DOM, so skip images, stylesheets, web fonts and media
+    options.set_preference("permissions.default.image", 2)
+    options.set_preference("permissions.default.stylesheet", 2)
+    options.set_preference("browser.display.use_document_fonts", 0)
+    options.set_preference("media.autoplay.default", 5)
+    # and don't let a site's notification prompt sit over the page
+    options.set_preference("dom.webnotifications.enabled", False)
+    return webdriver.Firefox(options=options)
+
+def parse_game_links(html, week):
+    '''
+    Return the box score links in the given week's table of the games index page,
+    None if the page doesn't hold that table
+    '''
+    if not html:
+        return None
+    # the same C-parsed lxml tree and XPath as the box score pages
+    tree = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    tables = GAME_TABLES_XPATH(tree)
+    if len(tables) < week:
+        return None
     links = []
-    for game in games:
+    for game in ROWS_XPATH(tables[week-1]):
+        link = LINK_XPATH(game)
+        if link:
+            links.append(link[0].get("href"))
+    return links
+
+def get_game_links(session, week):
+    '''
+    Return the box score links for every game in the given week.
+    The index page is static, so it's fetched with requests and a browser
+    is only started if the week's table isn't in it
+    '''
+    url = f'{BASE_URL}/games/index.html'
+    try:
+        response = session.get(url, timeout=REQUEST_TIMEOUT)
+        html = response.content if response.ok else None
+    except requests.RequestException:
+        html = None
+    links = parse_game_links(html, week)
+
+    if links is None:
+        driver = setup_driver()
         try:
-            link = game.find("a").get('href')
-            links.append(link)
-        except:
-            continue
-
-    for link in links:
-        #html = pd.read_html(f"https://www.footballdb.com{link}")
-        driver.get(f"https://www.footballdb.com{link}")
-        #driver.implicitly_wait(120)
-        result = driver.page_source
-        soup = BeautifulSoup(result, "html.parser")
-        data = soup.find('div', {"id": "divBox_stats"})
-        headers = soup.find_all('div', class_="divider")
-        tables = data.find_all("table")
-        data_dict = {}
-        for j in range(0, 6):
-        #for table in tables:
-            head = tables[j].find("thead")
-            body = tables[j].find("tbody")
-            hs = head.find_all("th")
-            try:
-                bs_r = body.find_all("tr")
-            except:
-                bs_r = body.find("tr")
-            #print(bs)
-            for x in range(0, len(bs_r)):
-                #print(bs_r)
-                bs = bs_r[x].find_all("td")
-                for i in range(0, len(hs)):
-                    data_dict[hs[i].text]= bs[i].text
-                if j < 2:                
-                    row = [fix_player(list(data_dict.values())[0]), data_dict["Yds"], data_dict["TD"], data_dict["Int"]]
-                    pass_df.loc[len(pass_df)] = row
-                elif j < 4:
-                    row = [fix_player(list(data_dict.values())[0]), data_dict["Yds"], data_dict["TD"]]
-                    rush_df.loc[len(rush_df)] = row
-                else:
-                    row = [fix_player(list(data_dict.values())[0]), data_dict["Rec"], data_dict["Yds"], data_dict["TD"]]
-                    rec_df.loc[len(rec_df)] = row
-
-                data_dict.clear()
-
-    master = pd.merge(pass_df, rush_df, how='outer', on='player')
-    master = pd.merge(master, rec_df, how='outer', on='player')
-    master = master.fillna(0)
-    col_of_interets = ["pass_Yds", "pass_TD", "pass_INT", "rush_Yds", "rush_TD", "rec_Rec", "rec_Yds", "rec_TD"]
-
-    for key in col_of_interets:
-        master[key] = master[key].apply(lambda x: dk_scoring(x, key))
-
-    #master["DFS Total"] = master[col_of_interets].sum()
-    master["DFS Total"] = master.iloc[:, 1:].sum(axis=1)
+            driver.get(url)
+            WebDriverWait(driver, WAIT_TIMEOUT).until(EC.presence_of_element_located(GAMES_LOCATOR))
+            links = parse_game_links(driver.page_source.encode("utf-8"), week)
+        finally:
+            driver.quit()
+        if links is None:
+            raise ValueError(f"No week {week} games found at {url}")
+    return links
+
+def setup_session(pool_size=FETCH_WORKERS):
+    '''A requests session with a browser User-Agent and a connection pool sized for the workers'''
+    session = requests.Session()
+    session.headers["User-Agent"] = USER_AGENT
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    return session
+
+# cell positions per (stat type, header row), every game uses the same few headers
+_STAT_CELLS = {}
+
+def stat_cells(stat_type, headers):
+    '''The positions of the player cell and the stat type's fields in a table with these headers'''
+    key = (stat_type, headers)
+    if key not in _STAT_CELLS:
+        # a repeated header resolves to its last column
+        col = {h: i for i, h in enumerate(headers)}
+        _STAT_CELLS[key] = [col[headers[0]]] + [col[f] for f in STAT_FIELDS[stat_type]]
+    return _STAT_CELLS[key]
+
+def parse_box_score(html):
+    '''
+    Parse a box score page into lists of passing, rushing and receiving row tuples,
+    returns None if the page doesn't hold the stats tables
+    '''
+    if not html:
+        return None
+    # one C-parsed tree queried with XPath, no per-node BeautifulSoup objects
+    tree = lxml.html.document_fromstring(html, parser=lxml.html.HTMLParser(encoding="utf-8"))
+    tables = STATS_XPATH(tree)
+    if len(tables) < len(STAT_TABLES):
+        return None
+    rows = {stat_type: [] for stat_type in STAT_FIELDS}
+    for table, stat_type in zip(tables, STAT_TABLES):
+        hs = tuple(th.text_content().strip() for th in HEADERS_XPATH(table))
+        cells = stat_cells(stat_type, hs)
+        # read only the player and stat cells, straight into a fixed-width record
+        for tr in BODY_ROWS_XPATH(table):
+            tds = CELLS_XPATH(tr)
+            rows[stat_type].append(tuple(tds[i].text_content().strip() for i in cells))
+    return rows["passing"], rows["rushing"], rows["receiving"]
+
+def page_cache_path(cache_dir, link):
+    '''Where a box score page is saved in cache_dir, None when caching is off'''
+    if cache_dir is None:
+        return None
+    return os.path.join(cache_dir, f"{os.path.basename(link.rstrip('/'))}.html")
+
+def is_final(link, fetched):
+    '''
+    True if a box score page fetched on the date fetched has the game's final stats.
+    Links without a kickoff date are never treated as final
+    '''
+    match = GAME_DATE.search(link.rstrip("/"))
+    if match is None:
+        return False
+    kickoff = datetime.strptime(match.group(1), "%Y%m%d").date()
+    return fetched > kickoff + FINAL_AFTER
+
+def save_page(cache_path, link, html):
+    '''Save a box score page to the cache once its game is final, stats of a game in progress still change'''
+    if cache_path is not None and is_final(link, date.today()):
+        with open(cache_path, "wb") as f:
+            f.write(html)
+
+def process_game(session, link, cache_dir=None):
+    '''
+    Scrape one box score page into passing, rushing and receiving rows.
+    A page saved in cache_dir after its game was final is parsed without touching the network,
+    otherwise the static HTML is fetched with requests and saved to cache_dir if it parses.
+    Returns None if the stats aren't in the static page
+    '''
+    cache_path = page_cache_path(cache_dir, link)
+    if (cache_path is not None and os.path.exists(cache_path) and os.path.getsize(cache_path) > 0
+            and is_final(link, date.fromtimestamp(os.path.getmtime(cache_path)))):
+        with open(cache_path, "rb") as f:
+            game = parse_box_score(f.read())
+        if game is not None:
+            return game
+
+    try:
+        response = session.get(f"{BASE_URL}{link}", timeout=REQUEST_TIMEOUT)
+        html = response.content if response.ok else None
+    except requests.RequestException:
+        html = None
+    game = parse_box_score(html)
+    if game is not None:
+        save_page(cache_path, link, html)
+    return game
+
+class DriverPool:
+    '''
+    Headless browsers kept warm between box score pages. A browser is only started when
+    every one already started is busy, so the pool never grows past the number of workers
+    '''
+    def __init__(self):
+        self.idle = queue.Queue()
+        self.drivers = []
+
+    @contextmanager
+    def acquire(self):
+        '''Lend out a (browser, wait) pair, returning it to the pool afterwards'''
+        try:
+            driver, wait = self.idle.get_nowait()
+        except queue.Empty:
+            driver = setup_driver()
+            wait = WebDriverWait(driver, WAIT_TIMEOUT)
+            self.drivers.append(driver)
+        try:
+            yield driver, wait
+        finally:
+            self.idle.put((driver, wait))
+
+    def close(self):
+        for driver in self.drivers:
+            driver.quit()
+
+def process_game_in_browser(drivers, link, cache_dir=None):
+    '''
+    Scrape one box score page with a browser from the DriverPool,
+    for pages process_game couldn't read. Saves the page to cache_dir once the game is final
+    '''
+    url = f"{BASE_URL}{link}"
+    with drivers.acquire() as (driver, wait):
+        driver.get(url)
+        # read the page as soon as the six passing/rushing/receiving tables are in the DOM
+        wait.until(lambda d: len(d.find_elements(*STATS_TABLES_LOCATOR)) >= len(STAT_TABLES))
+        html = driver.page_source.encode("utf-8")
+    game = parse_box_score(html)
+    if game is None:
+        raise ValueError(f"No box score stats found at {url}")
+
+    save_page(page_cache_path(cache_dir, link), link, html)
+    return game
+
+def process_all_games(links, session, max_workers=FETCH_WORKERS, max_browsers=4, cache_dir=None):
+    '''
+    Scrape every box score and return the combined passing, rushing and receiving
+    DataFrames in link order. The pages are fetched by a pool of threads sharing the
+    requests session, then only the pages that didn't parse go through a smaller pool of
+    browsers. Raw pages are read from and saved to cache_dir when it's given
+    '''
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+    # the fetches are network bound, so run more of them at once than there are browsers
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        games = list(executor.map(lambda link: process_game(session, link, cache_dir), links))
+
+    missing = [i for i, game in enumerate(games) if game is None]
+    if missing:
+        drivers = DriverPool()
+        try:
+            with ThreadPoolExecutor(max_workers=min(max_browsers, len(missing))) as executor:
+                found = executor.map(lambda i: process_game_in_browser(drivers, links[i], cache_dir), missing)
+                for i, game in zip(missing, found):
+                    games[i] = game
+        finally:
+            drivers.close()
+
+    # build each stat type's DataFrame once from every game's rows
+    pass_rows, rush_rows, rec_rows = [], [], []
+    for game_pass, game_rush, game_rec in games:
+        pass_rows.extend(game_pass)
+        rush_rows.extend(game_rush)
+        rec_rows.extend(game_rec)
+    pass_df = stat_frame(pass_rows, PASS_COLUMNS)
+    rush_df = stat_frame(rush_rows, RUSH_COLUMNS)
+    rec_df = stat_frame(rec_rows, REC_COLUMNS)
+    return pass_df, rush_df, rec_df
+
+def stat_frame(rows, columns):
+    '''Build a stat type's DataFrame from scraped rows with integer stat columns and clean names'''
+    df = pd.DataFrame.from_records(rows, columns=columns).astype(dict.fromkeys(columns[1:], "int16"))
+    df["player"] = clean_players(df["player"])
+    return df
+
+
+def scrape_week(week, use_cache=True):
+    '''Scrape one week's box scores and write its box_score_debug.csv'''
+    cache_dir = f"2024/WEEK{week}/cache" if use_cache else None
+
+    # one connection pool for the index and every box score page
+    with setup_session() as session:
+        links = get_game_links(session, week)
+        pass_df, rush_df, rec_df = process_all_games(links, session, cache_dir=cache_dir)
+
+    # one row per player: the stat types have disjoint columns, so stack them and total
+    # everything in one groupby, where a player's missing stats sum to 0
+    master = pd.concat([pass_df, rush_df, rec_df], ignore_index=True).groupby("player", as_index=False).sum()
+    master = calculate_dfs_points(master)
     master.rename(columns={"player" : "Name"}, inplace=True)
-    master["Name"] = master["Name"].apply(lambda x: fix_name(x))
-    master.to_csv(f"2024/WEEK{WEEK}/box_score_debug.csv")
-    print(f"Successfully wrote box scores to WEEK{WEEK} folder")
-    driver.close()
-    driver.quit()  
+    master["Name"] = fix_names(master["Name"])
+    # DraftKings points never go past two decimals, so don't write the float noise
+    master.to_csv(f"2024/WEEK{week}/box_score_debug.csv", float_format="%.2f")
+    print(f"Successfully wrote box scores to WEEK{week} folder")
+
+def main(argv):
+    argParser = argparse.ArgumentParser()
+    argParser.add_argument("week", type=int, nargs="+", help="NFL Week(s)")
+    argParser.add_argument("--no-cache", action="store_true",
+                           help="Always download box score pages instead of reusing the saved copies")
+    args = argParser.parse_args()
+    weeks = args.week
+    use_cache = not args.no_cache
+
+    if len(weeks) == 1:
+        scrape_week(weeks[0], use_cache)
+    else:
+        # weeks don't depend on each other, so each one gets its own process
+        with ProcessPoolExecutor(max_workers=min(len(weeks), os.cpu_count() or 1)) as executor:
+            list(executor.map(scrape_week, weeks, [use_cache] * len(weeks)))
 
 if __name__ == "__main__":
     main(sys.argv[1:])
\ No newline at end of file
@@ -1,10 +1,10 @@
 # Standard library imports
 import argparse
-import copy
 from dataclasses import dataclass
+from functools import cached_property, lru_cache
+import heapq
 import random
 import sys
-from collections import Counter
 from typing import Dict, List, Optional, Union
 
 # Third-party imports
@@ -68,9 +68,9 @@ class Player:
         """Returns the value (points per thousand dollars) of a Player"""
         return (self.score / self.salary) * 1000
 
-    @property
+    @cached_property
     def opponent(self) -> str:
-        """Returns the opposing team of a Player"""
+        """Returns the opposing team of a Player, parsed from game_info on first use"""
         home, away = self.game_info.split(" ")[0].split("@")
         return away if home == self.team else home
 
@@ -96,6 +96,74 @@ class Player:
     def __repr__(self) -> str:
         return f"Player(name='{self.name}', position='{self.position}', salary={self.salary}, score={self.score})"
 
+def players_from_df(df: pd.DataFrame) -> List[Player]:
+    """
+    Create a Player for every row of a DataFrame in one pass, keeping row order
+    
+    Args:
+        df: DataFrame with the columns Player.from_dataframe reads
+        
+    Returns:
+        List[Player]: One Player per row
+    
+    Raises:
+        ValueError: If required fields are missing
+    """
+    score_col = "Proj DFS Total" if "Proj DFS Total" in df else "Act DFS Total"
+    columns = ["Name + ID", "Position", "Salary", score_col, "Game Info", "TeamAbbrev"]
+    try:
+        rows = df[columns].itertuples(index=False, name=None)
+    except KeyError as e:
+        raise ValueError(f"Missing required field: {e}")
+    return [
+        Player(name=name, position=position, salary=float(salary), score=float(score),
+               game_info=game_info, team=team)
+        for name, position, salary, score, game_info, team in rows
+    ]
+
+@dataclass
+class PositionPool:
+    """A class to represent the replacement candidates for one position, best projection first"""
+    players: List[Player]
+    salaries: np.ndarray
+    scores: np.ndarray
+    names: np.ndarray
+    teams: np.ndarray
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> 'PositionPool':
+        """Create a PositionPool from a DataFrame, keeping its row order"""
+        players = players_from_df(df)
+        return cls(
+            players=players,
+            salaries=np.fromiter((p.salary for p in players), dtype=float, count=len(players)),
+            scores=np.fromiter((p.score for p in players), dtype=float, count=len(players)),
+            names=np.array([p.name for p in players], dtype=object),
+            teams=np.array([p.team for p in players], dtype=object)
+        )
+
+    def first_upgrade(self, player: Player, low: float, high: float, exclude: List[str]) -> Optional[Player]:
+        """
+        Find the first candidate priced strictly between low and high that outscores player
+        
+        Args:
+            player: Player being replaced
+            low: Exclusive lower salary bound
+            high: Exclusive upper salary bound
+            exclude: Names that can't be picked, e.g. the rest of the lineup
+            
+        Returns:
+            Optional[Player]: The earliest matching candidate in pool order, None if there is none
+        """
+        mask = (
+            (self.salaries > low) &
+            (self.salaries < high) &
+            (self.scores > player.score) &
+            ~np.isin(self.names, exclude)
+        )
+        hits = np.flatnonzero(mask)
+        return self.players[hits[0]] if hits.size else None
+
 class LineUp:
     """A class to represent a DraftKings lineup"""
     SALARY_CAP = 50000
@@ -166,9 +234,15 @@ class LineUp:
         self._names = None
 
     def update_player(self, position: str, player: Player):
-        """Updates a single player and invalidates cache"""
+        """Updates a single player, adjusting any cached values for the swapped slot"""
+        old = self._players[position]
         self._players[position] = player
-        self._invalidate_cache()
+        if self._salary is not None:
+            self._salary += player.salary - old.salary
+        if self._total is not None:
+            self._total += player.score - old.score
+        if self._names is not None:
+            self._names[list(self._players).index(position)] = player.name
 
     def replace_player(
     self, 
@@ -176,7 +250,8 @@ class LineUp:
     position: str, 
     df: pd.DataFrame,
     current_exposures: dict = None,
-    max_exposure: float = 0.66
+    max_exposure: float = 0.66,
+    pools: Optional[Dict[str, 'PositionPool']] = None
     ) -> Optional['LineUp']:
         """
         Attempt to replace a player in this lineup with a similar player
@@ -187,15 +262,14 @@ class LineUp:
             df: Player pool DataFrame
             current_exposures: Dictionary of current player exposures
             max_exposure: Maximum allowed exposure
+            pools: Candidates per position from replacement_pools, built from df if not given
             
         Returns:
             Optional[LineUp]: New lineup if successful, None if no valid replacement found
         """
-        # Get position-specific DataFrame
-        if position == "FLEX":
-            pos_df = position_df(df, "FLEX").copy()
-        else:
-            pos_df = df[df["Position"] == position.replace("1", "").replace("2", "").replace("3", "")].copy()
+        if pools is None:
+            pools = replacement_pools(df)
+        pool = pools[position.replace("1", "").replace("2", "").replace("3", "")]
         
         # Calculate target salary range
         current_salary = next(
@@ -204,37 +278,40 @@ class LineUp:
         )
         salary_buffer = 500
         
-        # Filter potential replacements
-        replacements = pos_df[
-            (pos_df["Salary"] >= current_salary - salary_buffer) &
-            (pos_df["Salary"] <= current_salary + salary_buffer) &
-            (pos_df["Name + ID"] != player_name)
-        ]
+        mask = (
+            (pool.salaries >= current_salary - salary_buffer) &
+            (pool.salaries <= current_salary + salary_buffer) &
+            (pool.names != player_name)
+        )
         
-        # Sort replacements by projected points (descending)
-        replacements = replacements.sort_values(by="Proj DFS Total", ascending=False)
+        # Skip players that would create new exposure problems
+        if current_exposures is not None:
+            crowded = [
+                name for name, exposure in current_exposures.items()
+                if exposure >= max_exposure * 0.8  # Use 80% of max as buffer
+            ]
+            mask &= ~np.isin(pool.names, crowded)
         
-        # Try each potential replacement
-        for _, row in replacements.iterrows():
-            new_player = Player.from_dataframe(row)
-            new_player_name = str(new_player)
-            
-            # Skip if replacement would create new exposure problems
-            if (current_exposures is not None and 
-                new_player_name in current_exposures and 
-                current_exposures[new_player_name] >= max_exposure * 0.8):  # Use 80% of max as buffer
-                continue
-                
-            new_lineup = copy.deepcopy(self)
-            new_lineup.update_player(position, new_player)
+        # Try each potential replacement, best-first, by swapping it in place
+        # so a rejected candidate costs no copy
+        original = self._players[position]
+        for idx in np.flatnonzero(mask):
+            self.update_player(position, pool.players[idx])
+            new_lineup = self._clone() if self.is_valid() else None
+            self.update_player(position, original)
             
-            if (new_lineup.salary <= 50000 and 
-                not new_lineup.duplicates() and 
-                not new_lineup.players_on_same_team()):
+            if new_lineup is not None:
                 return new_lineup
         
         return None
 
+    def _clone(self) -> 'LineUp':
+        """Returns a copy of the LineUp that shares its Player objects"""
+        clone = LineUp.__new__(LineUp)
+        clone._players = dict(self._players)
+        clone._invalidate_cache()
+        return clone
+
     @property
     def salary(self):
         """Returns the sum of the LineUp's total salary"""
@@ -256,6 +333,12 @@ class LineUp:
             self._names = [player.name for player in self._players.values()]
         return self._names
 
+    def is_valid(self) -> bool:
+        """Checks the LineUp is under the cap with no duplicates or stacked-up teams"""
+        return (self.salary <= self.SALARY_CAP and
+                not self.duplicates() and
+                not self.players_on_same_team())
+
     def duplicates(self) -> bool:
         """Checks the LineUp for duplicates"""
         return len(self.names) != len(set(self.names))
@@ -271,12 +354,12 @@ class LineUp:
 
     def players_on_same_team(self, threshold=MAX_PLAYERS_PER_TEAM) -> bool:
         """Returns if there are multiple players on the same team in the same lineup"""
-        team_counts = {}
-        for player in self._players.values():
-            team_counts[player.team] = team_counts.get(player.team, 0) + 1
-            if team_counts[player.team] > threshold:
-                return True
-        return False
+        teams = [player.team for player in self._players.values()]
+        # a team over the threshold repeats at least threshold times, so with
+        # fewer repeats overall no team can be over it
+        if len(teams) - len(set(teams)) < threshold:
+            return False
+        return max(map(teams.count, teams)) > threshold
 
     def get_lowest_sal_player(self) -> tuple[Player, str]:
         """Returns the player with the lowest salary (excluding defense)"""
@@ -292,10 +375,19 @@ class LineUp:
         
         return low_player, low_player_pos
 
-    def optimize(self, df: pd.DataFrame, wrt: Player) -> 'LineUp':
+    def optimize(self, df: pd.DataFrame, wrt: Player,
+                 pools: Optional[Dict[str, PositionPool]] = None) -> 'LineUp':
         """
         Attempt to optimize a lineup by replacing players with higher-scoring alternatives within budget
+        
+        Args:
+            df: Player pool DataFrame
+            wrt: Stack player that must stay in the lineup
+            pools: Candidates per roster key from roster_pools, built from df if not given
         """
+        if pools is None:
+            pools = roster_pools(df)
+
         for pos, player in self._players.items():
             if player.position == "QB" or player.name == wrt.name:
                 continue
@@ -303,42 +395,143 @@ class LineUp:
             remaining_budget = self.SALARY_CAP - self.salary
             salary_range = min(500, remaining_budget)
 
-            # Filter dataframe for potential replacements
-            df_filt = df[df["Roster Position"].str.contains(pos)]
-            df_filt = df_filt[
-                (df_filt["Salary"] < player.salary + salary_range) & 
-                (df_filt["Salary"] > player.salary - 500)
-            ]
+            # Try to find better players within the salary window
+            new_player = pools[pos].first_upgrade(
+                player, player.salary - 500, player.salary + salary_range, self.names)
+            if new_player is not None:
+                print(f"Replacing {player.name} with {new_player.name}")
+                self.update_player(pos, new_player)
 
-            # Try to find better players
-            for _, candidate in df_filt.iterrows():
-                new_player = Player.from_dataframe(candidate)
-                if (new_player.score > player.score and 
-                    new_player.name not in self.names):
-                    print(f"Replacing {player.name} with {new_player.name}")
-                    self.update_player(pos, new_player)
-                    break
+        # Spend the rest of the cap on the best set of upgrades, falling back to
+        # upgrading the lowest salary player if that set breaks a lineup rule
+        if self.upgrade_with_budget(pools, wrt):
+            return self
 
-        # Try to upgrade lowest salary player
         low_player, low_pos = self.get_lowest_sal_player()
         remaining_budget = self.SALARY_CAP - self.salary
-        
-        df_filt = df[df["Roster Position"].str.contains(low_player.position)]
-        df_filt = df_filt[
-            (df_filt["Salary"] < low_player.salary + remaining_budget) & 
-            (df_filt["Salary"] > low_player.salary)
-        ]
-
-        for _, candidate in df_filt.iterrows():
-            new_player = Player.from_dataframe(candidate)
-            if (new_player.score > low_player.score and 
-                new_player.name not in self.names):
-                print(f"Replacing {low_player.name} with {new_player.name}")
-                self.update_player(low_pos, new_player)
-                break
+
+        new_player = pools[low_player.position].first_upgrade(
+            low_player, low_player.salary, low_player.salary + remaining_budget, self.names)
+        if new_player is not None:
+            print(f"Replacing {low_player.name} with {new_player.name}")
+            self.update_player(low_pos, new_player)
 
         return self
 
+    def upgrade_with_budget(self, pools: Dict[str, PositionPool], wrt: Player) -> bool:
+        """
+        Spend the remaining salary on the highest scoring combination of upgrades, at most one per slot
+        
+        Every swap must raise its slot's score, and cheaper upgrades give their salary back
+        to the budget. The combination is a 0/1 knapsack over the leftover budget in $100
+        bins, which is exact for DraftKings salaries. The knapsack can pick one player for
+        several slots, so a repeat is resolved by branching on which slot keeps the player,
+        or none, and keeping the best result. A branch is dropped as soon as its knapsack
+        cannot beat the best combination found so far.
+        
+        Args:
+            pools: Candidates per roster key from roster_pools
+            wrt: Stack player that must stay in the lineup
+            
+        Returns:
+            bool: True if upgrades were made, False if there were none or they broke a lineup rule
+        """
+        bins = int((self.SALARY_CAP - self.salary) // 100)
+        if bins < 0:
+            return False
+
+        best_gain, swaps = 0.0, []
+        branches = [{pos: frozenset() for pos in self._players}]
+        while branches:
+            banned = branches.pop()
+            gain, branch_swaps = self._budget_swaps(pools, wrt, bins, banned)
+            # The knapsack allows repeats, so its gain bounds every branch below this one
+            if gain <= best_gain:
+                continue
+
+            slots_by_name = {}
+            for pos, _, new_player in branch_swaps:
+                slots_by_name.setdefault(new_player.name, []).append(pos)
+            repeated = next(((name, slots) for name, slots in slots_by_name.items() if len(slots) > 1), None)
+            if repeated is None:
+                best_gain, swaps = gain, branch_swaps
+                continue
+
+            name, slots = repeated
+            for keep in slots + [None]:
+                branches.append({
+                    pos: names | {name} if pos in slots and pos != keep else names
+                    for pos, names in banned.items()
+                })
+
+        if not swaps:
+            return False
+
+        old_players = {pos: self._players[pos] for pos, _, _ in swaps}
+        for pos, _, new_player in swaps:
+            self.update_player(pos, new_player)
+        if not self.is_valid():
+            for pos, old_player in old_players.items():
+                self.update_player(pos, old_player)
+            return False
+
+        for pos, _, new_player in reversed(swaps):
+            print(f"Replacing {old_players[pos].name} with {new_player.name}")
+        return True
+
+    def _budget_swaps(self, pools: Dict[str, PositionPool], wrt: Player, bins: int,
+                      banned: Dict[str, frozenset]) -> tuple[float, list[tuple[str, float, Player]]]:
+        """Solves the upgrade knapsack and returns its total gain and the chosen (slot, gain, player) swaps"""
+        slots = []
+        for pos, player in self._players.items():
+            if pos == "DST" or player.position == "QB" or player.name == wrt.name:
+                continue
+            pool = pools[pos.rstrip("123")]
+            # Refunds round down and charges round up, so off-grid salaries never overspend
+            cost = np.ceil((pool.salaries - player.salary) / 100).astype(int)
+            gain = pool.scores - player.score
+            excluded = self.names + list(banned[pos])
+            candidates = np.flatnonzero((gain > 0) & ~np.isin(pool.names, excluded))
+            if candidates.size:
+                slots.append((pos, pool, cost, gain, candidates))
+
+        # Budgets run from every refund taken (low) to the most that refunds can still
+        # bring back under the cap (high); best[j] is the best gain spending exactly low + j bins
+        low = sum(min(cost[candidates].min(), 0) for _, _, cost, _, candidates in slots)
+        size = bins - 2 * low + 1
+        best = np.full(size, -np.inf)
+        best[-low] = 0.0
+        steps = []
+        for pos, pool, cost, gain, candidates in slots:
+            candidates = candidates[cost[candidates] < size]
+            if not candidates.size:
+                continue
+            # Row 0 keeps the current player, row k takes candidate k on top of best[j - cost];
+            # argmax picks the winner per budget, the earliest row winning ties
+            spent = np.arange(size) - cost[candidates][:, None]
+            fits = (spent >= 0) & (spent < size)
+            taken = np.where(fits, best[np.clip(spent, 0, size - 1)] + gain[candidates][:, None], -np.inf)
+            table = np.vstack([best, taken])
+            pick = np.argmax(table, axis=0)
+            choice = np.where(pick > 0, candidates[pick - 1], -1)
+            steps.append((pos, pool, cost, gain, choice))
+            best = table[pick, np.arange(size)]
+
+        # Only budgets that end up under the cap count
+        j = int(np.argmax(best[:bins - low + 1]))
+        total_gain = float(best[j])
+        if total_gain <= 0:
+            return 0.0, []
+
+        # Walk the choices back from the best final budget
+        swaps = []
+        for pos, pool, cost, gain, choice in reversed(steps):
+            idx = choice[j]
+            if idx >= 0:
+                swaps.append((pos, gain[idx], pool.players[idx]))
+                j -= cost[idx]
+        return total_gain, swaps
+
     def __len__(self) -> int:
         return len(self._players)
 
@@ -438,10 +631,7 @@ class LineUps:
     @classmethod
     def from_dataframe(cls, df: pd.DataFrame) -> 'LineUps':
         """Create LineUps instance from a DataFrame"""
-        lineups = []
-        for _, row in df.iterrows():
-            lineups.append(LineUp.from_dataframe(row))
-        return cls(lineups)
+        return cls([LineUp.from_dataframe(row) for row in df.to_dict("records")])
     
     def to_dataframe(self) -> pd.DataFrame:
         """Convert lineups to DataFrame"""
@@ -452,12 +642,15 @@ class LineUps:
         print("\nOptimizing lineups...")
         stack_size = len(self.lineups) // len(stacks)
         
+        # Candidate lists are shared by every lineup
+        pools = roster_pools(df)
+        
         optimized_lineups = []
         for i, lineup in enumerate(self.lineups):
             stack_index = i // stack_size
             if stack_index < len(stacks):
                 try:
-                    optimized = lineup.optimize(df, stacks[stack_index].wrte)
+                    optimized = lineup.optimize(df, stacks[stack_index].wrte, pools)
                     optimized_lineups.append(optimized)
                 except Exception as e:
                     print(f"Error optimizing lineup {i}: {e}")
@@ -470,24 +663,24 @@ class LineUps:
     
     def check_exposures(self, max_exposure: float = 0.66) -> dict:
         """Check exposure percentages for all players"""
-        exposures = {}
         total_lineups = len(self.lineups)
         
-        # Count all players across all positions
-        all_players = []
-        for lineup in self.lineups:
-            all_players.extend(str(player) for player in lineup.players.values())
-            
-        # Calculate exposures
-        player_counts = Counter(all_players)
-        for player, count in player_counts.items():
-            exposures[player] = count / total_lineups
+        # Count all players across all positions in one pass, players in order of first appearance
+        all_players = np.array([lineup.names for lineup in self.lineups], dtype=object).ravel()
+        codes, players = pd.factorize(all_players)
+        player_counts = np.bincount(codes)
             
-        return exposures
+        return dict(zip(players, player_counts / total_lineups))
     
-    def reduce_exposure(self, df: pd.DataFrame, stacks: list[Stack], max_exposure: float = 0.66) -> 'LineUps':
-        """Reduce over-exposed players while maintaining lineup quality"""
+    def reduce_exposure(self, df: pd.DataFrame, stacks: list[Stack], max_exposure: float = 0.66,
+                        verbose: bool = False) -> 'LineUps':
+        """Reduce over-exposed players while maintaining lineup quality
+        
+        With verbose set, each iteration also prints the 10 most over-exposed players.
+        """
         self.lineups.sort(key=lambda x: x.total)
+        # Build the candidate arrays once; every replace_player call reuses them
+        pools = replacement_pools(df)
         max_iterations = 50
         iteration = 0
         
@@ -503,9 +696,10 @@ class LineUps:
                 print("\nAll player exposures are within limits")
                 break
                 
-            print(f"\nIteration {iteration + 1}: Reducing exposure for:")
-            for player, exposure in over_exposed.items():
-                print(f"{player}: {exposure:.1%}")
+            print(f"\nIteration {iteration + 1}: Reducing exposure for {len(over_exposed)} players")
+            if verbose:
+                worst = heapq.nlargest(10, over_exposed.items(), key=lambda x: x[1])
+                print("\n".join(f"{player}: {exposure:.1%}" for player, exposure in worst))
             
             changes_made = False
             # Try to fix over-exposed players
@@ -519,7 +713,8 @@ class LineUps:
                                 pos,
                                 df,
                                 current_exposures=exposures,
-                                max_exposure=max_exposure
+                                max_exposure=max_exposure,
+                                pools=pools
                             )
                             if new_lineup:
                                 self.lineups[i] = new_lineup
@@ -547,15 +742,16 @@ class LineUps:
     
     def print_summary(self) -> None:
         """Print summary of all lineups"""
+        totals = np.fromiter((l.total for l in self.lineups), dtype=float, count=len(self.lineups))
         print("\nLineup Summary:")
         print(f"Total Lineups: {len(self.lineups)}")
-        print(f"Average Points: {sum(l.total for l in self.lineups)/len(self.lineups):.2f}")
-        print(f"Point Range: {min(l.total for l in self.lineups):.2f} - {max(l.total for l in self.lineups):.2f}")
+        print(f"Average Points: {totals.mean():.2f}")
+        print(f"Point Range: {totals.min():.2f} - {totals.max():.2f}")
         
         # Print exposure summary
         print("\nPlayer Exposures:")
         exposures = self.check_exposures()
-        for player, exp in sorted(exposures.items(), key=lambda x: x[1], reverse=True)[:10]:
+        for player, exp in heapq.nlargest(10, exposures.items(), key=lambda x: x[1]):
             print(f"{player}: {exp:.1%}")
     
     def __len__(self) -> int:
@@ -611,59 +807,57 @@ def qb_wr_stack(df: pd.DataFrame, team: str) -> list[Stack]:
         )
 
     # Create all possible stacks
-    stacks = []
-    for _, qb_row in qb_df.iterrows():
-        qb = Player.from_dataframe(qb_row)
-        
-        for _, wrte_row in wrte_df.iterrows():
-            wrte = Player.from_dataframe(wrte_row)
-            stacks.append(Stack(qb, wrte))
+    wrtes = players_from_df(wrte_df)
+    return [Stack(qb, wrte) for qb in players_from_df(qb_df) for wrte in wrtes]
 
-    return stacks
 
+def _top_two(scores: np.ndarray) -> list[int]:
+    """Indices of the best and second-best scores, first occurrence winning ties"""
+    scores = scores.copy()
+    best = int(np.argmax(scores))
+    if len(scores) < 2:
+        return [best]
+    scores[best] = -np.inf
+    return [best, int(np.argmax(scores))]
 
-def find_best_stack(df: pd.DataFrame, attr: str = "point", second_best: bool = False, limit:int=14500) -> Stack:
+def find_best_stacks(df: pd.DataFrame, limit: int = 14500) -> list[Stack]:
     """
-    Find the best or second-best stack based on total points or value
+    Find the best and second-best stacks by points and by value in a single pass
     
     Args:
         df: DataFrame containing player data
-        attr: Attribute to use for comparison ('point' or 'value')
-        second_best: If True, returns the second-best stack instead of the best
+        limit: Maximum combined salary of a stack
         
     Returns:
-        Stack: The best (or second-best) performing stack
+        list[Stack]: [best points, best value, second-best points, second-best value]
         
     Raises:
         ValueError: If no valid stacks are found
     """
-    # Store all stacks and their scores
-    stack_scores = []
-    
+    stacks = []
     for team in df["TeamAbbrev"].unique():
         try:
             team_stacks = qb_wr_stack(df, team)
         except Exception as e:
             print(f"Warning: {str(e)}")
             continue
-            
-        for stack in team_stacks:
-            score = stack.get_attribute(attr)
-            if stack.salary < limit:
-                stack_scores.append((stack, score))
+        stacks.extend(stack for stack in team_stacks if stack.salary < limit)
     
-    if not stack_scores:
+    if not stacks:
         raise ValueError("No valid stacks found")
     
-    # Sort stacks by score in descending order
-    stack_scores.sort(key=lambda x: x[1], reverse=True)
-    
-    # Return second-best if requested and available
-    if second_best and len(stack_scores) > 1:
-        return stack_scores[1][0]
+    points = np.fromiter((stack.total for stack in stacks), dtype=float, count=len(stacks))
+    values = np.fromiter((stack.value for stack in stacks), dtype=float, count=len(stacks))
+    top_points = _top_two(points)
+    top_values = _top_two(values)
     
-    # Otherwise return the best stack
-    return stack_scores[0][0]
+    # Fall back to the best stack when there is no runner-up
+    return [
+        stacks[top_points[0]],
+        stacks[top_values[0]],
+        stacks[top_points[-1]],
+        stacks[top_values[-1]]
+    ]
 
 def position_df(df: pd.DataFrame, pos: str):
     "a function that returns a filtered dataframe by position"
@@ -675,6 +869,82 @@ def position_df(df: pd.DataFrame, pos: str):
         new_df.reset_index(drop=True, inplace=True)
     return new_df
 
+def roster_pools(df: pd.DataFrame) -> Dict[str, PositionPool]:
+    """
+    Build the replacement candidates for every lineup slot and position once
+    
+    Args:
+        df: Player pool DataFrame
+        
+    Returns:
+        Dict[str, PositionPool]: Players whose Roster Position contains each key, in DataFrame order
+    """
+    keys = ["QB", "RB1", "RB2", "WR1", "WR2", "WR3", "TE", "FLEX", "DST", "RB", "WR"]
+    return {
+        key: PositionPool.from_dataframe(df[df["Roster Position"].str.contains(key)])
+        for key in keys
+    }
+
+def replacement_pools(df: pd.DataFrame) -> Dict[str, PositionPool]:
+    """
+    Build the exposure-replacement candidates for every position once
+    
+    Args:
+        df: Player pool DataFrame
+        
+    Returns:
+        Dict[str, PositionPool]: Candidates per position (plus FLEX), sorted by projected points
+    """
+    df = df.sort_values(by="Proj DFS Total", ascending=False)
+    pools = {
+        pos: PositionPool.from_dataframe(df[df["Position"] == pos])
+        for pos in ["QB", "RB", "WR", "TE", "DST"]
+    }
+    pools["FLEX"] = PositionPool.from_dataframe(df[df["Position"].isin(["WR", "RB"])])
+    return pools
+
+def top_by_value(df: pd.DataFrame, k: int) -> pd.DataFrame:
+    "a function that returns a copy of the k best points per dollar rows, best first"
+    value = (df['Proj DFS Total'] / df['Salary']).to_numpy()
+    keep = np.arange(len(value))
+    if len(value) > k:
+        # partial select the k-th best value, then only sort the rows that reach it
+        cutoff = -np.partition(-value, k - 1)[k - 1]
+        keep = np.flatnonzero(value >= cutoff)
+    order = keep[np.lexsort((keep, -value[keep]))][:k]
+    top = df.iloc[order].copy()
+    top.loc[:, 'value'] = value[order]
+    return top
+
+def valid_lineups(salaries: np.ndarray, ids: np.ndarray, teams: np.ndarray,
+                  cap: float = LineUp.SALARY_CAP,
+                  max_per_team: int = LineUp.MAX_PLAYERS_PER_TEAM) -> np.ndarray:
+    """
+    LineUp.is_valid for a block of candidate lineups at once
+    
+    Args:
+        salaries: Total salary of each lineup
+        ids: Integer player codes, one row of 9 per lineup
+        teams: Integer team codes, one row of 9 per lineup
+        cap: Salary cap
+        max_per_team: Most players allowed from one team
+        
+    Returns:
+        np.ndarray: True for each lineup under the cap with no duplicates or stacked-up teams
+    """
+    # a repeated player sorts next to itself, a team over the limit spans max_per_team more columns
+    ids = np.sort(ids, axis=1)
+    teams = np.sort(teams, axis=1)
+    return (
+        (salaries <= cap) &
+        ~(ids[:, 1:] == ids[:, :-1]).any(axis=1) &
+        ~(teams[:, max_per_team:] == teams[:, :-max_per_team]).any(axis=1)
+    )
+
+def encode(values, codes: dict) -> np.ndarray:
+    "a function that maps values to integer codes, adding new values to codes"
+    return np.fromiter((codes.setdefault(v, len(codes)) for v in values), dtype=np.int32, count=len(values))
+
 def find_name(data: str):
     '''Make NFL.com team naming the same as DK team naming'''
     data = data.split('  ')
@@ -743,6 +1013,32 @@ def generate_line_up_from_stack(df: pd.DataFrame, stacks: list[Stack], NoL: int
     """
     all_lineups = []
     
+    # Pre-filter and sort positions by points per dollar (value) once,
+    # the pools are the same for every stack
+    rb_df = top_by_value(position_df(df, "RB"), 20)
+    wr_df = top_by_value(position_df(df, "WR"), 20)
+    flex_df = top_by_value(position_df(df, "FLEX"), 20)
+    te_fill = players_from_df(top_by_value(position_df(df, "TE"), 1))[0]
+
+    # Handle DST separately, only the opponent filter depends on the stack
+    dst_pool = df[df["Position"] == "DST"]
+    dst_by_opponent = {}
+
+    # The candidates as arrays, with names and teams as integer codes so whole
+    # blocks of lineups can be checked at once
+    name_ids, team_ids = {}, {}
+    rb = PositionPool.from_dataframe(rb_df)
+    wr = PositionPool.from_dataframe(wr_df)
+    flex = PositionPool.from_dataframe(flex_df)
+    rb_ids, rb_teams = encode(rb.names, name_ids), encode(rb.teams, team_ids)
+    wr_ids, wr_teams = encode(wr.names, name_ids), encode(wr.teams, team_ids)
+    flex_ids, flex_teams = encode(flex.names, name_ids), encode(flex.teams, team_ids)
+    rb_pairs = np.column_stack(np.triu_indices(len(rb.players), k=1))
+    wr_pairs = np.column_stack(np.triu_indices(len(wr.players), k=1))
+    rb_pair_salaries = rb.salaries[rb_pairs].sum(axis=1)
+    wr_pair_salaries = wr.salaries[wr_pairs].sum(axis=1)
+    wr_fill = wr.players[0]
+    
     for stack in stacks:
         print(f"\nGenerating lineups for stack:")
         print(stack)
@@ -754,84 +1050,71 @@ def generate_line_up_from_stack(df: pd.DataFrame, stacks: list[Stack], NoL: int
         # Handle WR/TE stack player
         if stack.wrte.position == "WR":
             wr1 = stack.wrte
-            te_df = position_df(df, "TE").copy()
-            te_df.loc[:, 'value'] = te_df['Proj DFS Total'] / te_df['Salary']
-            te_df = te_df.sort_values(by='value', ascending=False)
-            te = Player.from_dataframe(te_df.iloc[0:1])
+            te = te_fill
         else:
             te = stack.wrte
-            wr_df = position_df(df, "WR").copy()
-            wr_df.loc[:, 'value'] = wr_df['Proj DFS Total'] / wr_df['Salary']
-            wr_df = wr_df.sort_values(by='value', ascending=False)
-            wr1 = Player.from_dataframe(wr_df.iloc[0:1])
-
-        # Pre-filter and sort positions by points per dollar (value)
-        rb_df = position_df(df, "RB").copy()
-        rb_df.loc[:, 'value'] = rb_df['Proj DFS Total'] / rb_df['Salary']
-        rb_df = rb_df.sort_values(by='value', ascending=False).head(20)
-
-        wr_df = position_df(df, "WR").copy()
-        wr_df.loc[:, 'value'] = wr_df['Proj DFS Total'] / wr_df['Salary']
-        wr_df = wr_df.sort_values(by='value', ascending=False).head(20)
-
-        flex_df = position_df(df, "FLEX").copy()
-        flex_df.loc[:, 'value'] = flex_df['Proj DFS Total'] / flex_df['Salary']
-        flex_df = flex_df.sort_values(by='value', ascending=False).head(20)
-
-        # Handle DST separately
-        dst_df = df[df["Position"] == "DST"].copy()
-        dst_df = dst_df[dst_df["TeamAbbrev"] != opp_team]
-        dst_df.loc[:, 'value'] = dst_df['Proj DFS Total'] / dst_df['Salary']
-        dst_df = dst_df.sort_values(by='value', ascending=False).head(10)
-        dst_df.reset_index(drop=True, inplace=True)
+            wr1 = wr_fill
+
+        if opp_team not in dst_by_opponent:
+            dst_by_opponent[opp_team] = PositionPool.from_dataframe(
+                top_by_value(dst_pool[dst_pool["TeamAbbrev"] != opp_team], 10))
+        dst = dst_by_opponent[opp_team]
+        dst_ids, dst_teams = encode(dst.names, name_ids), encode(dst.teams, team_ids)
+
+        fixed = [qb, wr1, te]
+        fixed_salary = sum(player.salary for player in fixed)
+        fixed_ids = encode([player.name for player in fixed], name_ids)
+        fixed_teams = encode([player.team for player in fixed], team_ids)
+        shape = (len(wr_pairs), len(flex.players), len(dst.players))
+
+        # Skip RB pairs that are over the cap even with the cheapest WR pair, FLEX and DST
+        if 0 in shape:
+            pairs = rb_pairs[:0]
+        else:
+            cheapest_rest = wr_pair_salaries.min() + flex.salaries.min() + dst.salaries.min()
+            pairs = rb_pairs[fixed_salary + rb_pair_salaries + cheapest_rest <= LineUp.SALARY_CAP]
 
         stack_lineups = 0
         with tqdm(total=NoL, desc="Generating lineups") as pbar:
-            # Systematic lineup generation
-            for rb1_idx in range(len(rb_df)):
-                rb1 = Player.from_dataframe(rb_df.iloc[rb1_idx:rb1_idx+1])
-                
-                for rb2_idx in range(rb1_idx + 1, len(rb_df)):
-                    rb2 = Player.from_dataframe(rb_df.iloc[rb2_idx:rb2_idx+1])
-                    
-                    for wr2_idx in range(len(wr_df)):
-                        wr2 = Player.from_dataframe(wr_df.iloc[wr2_idx:wr2_idx+1])
-                        
-                        for wr3_idx in range(wr2_idx + 1, len(wr_df)):
-                            wr3 = Player.from_dataframe(wr_df.iloc[wr3_idx:wr3_idx+1])
-                            
-                            for flex_idx in range(len(flex_df)):
-                                flex = Player.from_dataframe(flex_df.iloc[flex_idx:flex_idx+1])
-                                
-                                for dst_idx in range(len(dst_df)):
-                                    dst = Player.from_dataframe(dst_df.iloc[dst_idx:dst_idx+1])
-                                    
-                                    # Create and validate lineup
-                                    lineup = LineUp(qb, rb1, rb2, wr1, wr2, wr3, te, flex, dst)
-                                    
-                                    if (lineup.salary <= 50000 and 
-                                        not lineup.duplicates() and 
-                                        not lineup.players_on_same_team()):
-                                        
-                                        all_lineups.append(lineup)
-                                        stack_lineups += 1
-                                        pbar.update(1)
-                                        
-                                        if stack_lineups >= NoL:
-                                            break
-                                
-                                if stack_lineups >= NoL:
-                                    break
-                            
-                            if stack_lineups >= NoL:
-                                break
-                        
-                        if stack_lineups >= NoL:
-                            break
-                    
+            # Systematic lineup generation: for each RB pair, check every WR pair, FLEX and DST
+            # at once, in the order of the nested rb1/rb2/wr2/wr3/flex/dst loops
+            for rb1_idx, rb2_idx in pairs:
+                salary = (fixed_salary + rb.salaries[rb1_idx] + rb.salaries[rb2_idx] +
+                          wr_pair_salaries[:, None, None] + flex.salaries[None, :, None] +
+                          dst.salaries[None, None, :]).ravel()
+                slots = [
+                    np.concatenate([fixed_ids, rb_ids[[rb1_idx, rb2_idx]]]),
+                    wr_ids[wr_pairs][:, None, None, :],
+                    flex_ids[None, :, None, None],
+                    dst_ids[None, None, :, None],
+                ]
+                team_slots = [
+                    np.concatenate([fixed_teams, rb_teams[[rb1_idx, rb2_idx]]]),
+                    wr_teams[wr_pairs][:, None, None, :],
+                    flex_teams[None, :, None, None],
+                    dst_teams[None, None, :, None],
+                ]
+                ids = np.concatenate(
+                    [np.broadcast_to(slot, shape + slot.shape[-1:]) for slot in slots], axis=-1
+                ).reshape(-1, 9)
+                teams = np.concatenate(
+                    [np.broadcast_to(slot, shape + slot.shape[-1:]) for slot in team_slots], axis=-1
+                ).reshape(-1, 9)
+                valid = valid_lineups(salary, ids, teams)
+
+                for k in np.flatnonzero(valid):
+                    pair_idx, flex_idx, dst_idx = np.unravel_index(k, shape)
+                    wr2_idx, wr3_idx = wr_pairs[pair_idx]
+                    lineup = LineUp(qb, rb.players[rb1_idx], rb.players[rb2_idx], wr1,
+                                    wr.players[wr2_idx], wr.players[wr3_idx], te,
+                                    flex.players[flex_idx], dst.players[dst_idx])
+                    all_lineups.append(lineup)
+                    stack_lineups += 1
+                    pbar.update(1)
+
                     if stack_lineups >= NoL:
                         break
-                
+
                 if stack_lineups >= NoL:
                     break
     
@@ -884,6 +1167,7 @@ def find_opponent(data: pd.Series) -> str:
         raise ValueError(f"Invalid game info format: {game_info}") from e
 
 
+@lru_cache(maxsize=4096)
 def fix_name(data):
     if data == "Travis Etienne":
         return "Travis Etienne Jr."
@@ -933,6 +1217,10 @@ def fix_name(data):
         return "Bucky Irving"
     else:
         return data
+
+def fix_names(names: pd.Series) -> pd.Series:
+    """fix_name for a column of names, calling it once per distinct name"""
+    return names.map({name: fix_name(name) for name in names.unique()})
     
 def fetch_nfl_stats() -> tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
     """Fetch NFL statistics from various sources"""
@@ -1043,7 +1331,7 @@ def process_player_data(dk_pool: pd.DataFrame, dk_stat: pd.DataFrame, week: int,
     """Process and clean player data for DFS analysis"""
     
     # Clean and combine data
-    dk_stat["Name"] = dk_stat["Name"].apply(fix_name)
+    dk_stat["Name"] = fix_names(dk_stat["Name"])
     dk_defense = defense(dk_pool, week)
     dk_stat = pd.concat([dk_stat, dk_defense], ignore_index=True)
     
@@ -1111,11 +1399,7 @@ def main(argv):
     
     dfMain = process_player_data(dk_pool, dk_stat, WEEK, args, path)
 
-    best_stack_points = find_best_stack(dfMain)
-    best_stack_value = find_best_stack(dfMain, attr="value")
-    second_best_stack_points = find_best_stack(dfMain, second_best=True)
-    second_best_stack_value = find_best_stack(dfMain, attr="value", second_best=True)
-    stack_list = [best_stack_points, best_stack_value, second_best_stack_points, second_best_stack_value]
+    stack_list = find_best_stacks(dfMain)
     # Generate lineups
     lineups = generate_line_up_from_stack(dfMain, stack_list)
     
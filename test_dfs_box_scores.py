@@ -0,0 +1,47 @@
+import unittest
+from datetime import date
+import numpy as np
+import pandas as pd
+from dfs_box_scores import DK_POINTS, calculate_dfs_points, clean_players, dk_scoring, fix_player, is_final
+
+NAMES = ["Patrick Mahomes", "Christian McCaffrey", "Amon-Ra St. Brown", "Equanimeous St. Brown",
+         "D.K. Metcalf", "A.J. Brown", "T.J. Hockenson", "Re'Mahn Davis", "Kenneth Walker III",
+         "C.J. Stroud", "JuJu Smith-Schuster"]
+
+
+def raw_cell(name):
+    '''Name cell as the box score renders it: full name followed by first initial and last name'''
+    first, last = name.split(" ", 1)
+    return f"{name}{first[0]}. {last}"
+
+
+class TestFunctions(unittest.TestCase):
+    def test_clean_players_matches_fix_player(self):
+        cells = pd.Series([raw_cell(name) for name in NAMES] + ["Someone KickerS. Kicker", "D. K. MetcalfD. Metcalf"])
+        self.assertEqual(clean_players(cells).tolist(), [fix_player(cell) for cell in cells])
+
+    def test_calculate_dfs_points_matches_dk_scoring(self):
+        # spread the stats around the bonus thresholds so both sides of each one come up
+        rng = np.random.default_rng(0)
+        columns = list(DK_POINTS)
+        stats = pd.DataFrame(rng.integers(0, 400, (500, len(columns))), columns=columns)
+        stats["pass_INT"] = rng.integers(0, 4, len(stats))
+        for col in ["pass_TD", "rush_TD", "rec_TD"]:
+            stats[col] = rng.integers(0, 5, len(stats))
+        stats["rec_Rec"] = rng.integers(0, 15, len(stats))
+
+        expected = pd.DataFrame({col: [dk_scoring(value, col) for value in stats[col]] for col in columns})
+        points = calculate_dfs_points(stats.copy())
+        for col in columns:
+            np.testing.assert_allclose(points[col], expected[col], rtol=1e-6, err_msg=col)
+        np.testing.assert_allclose(points["DFS Total"], expected.sum(axis=1), rtol=1e-6)
+
+    def test_is_final_waits_until_the_game_is_over(self):
+        link = "/games/boxscore/kansas-city-chiefs-vs-baltimore-ravens-2024090501/"
+        self.assertFalse(is_final(link, date(2024, 9, 5)))
+        self.assertFalse(is_final(link, date(2024, 9, 6)))
+        self.assertTrue(is_final(link, date(2024, 9, 7)))
+        self.assertFalse(is_final("/games/boxscore/game-1", date(2030, 1, 1)))
+
+if __name__ == '__main__':
+    unittest.main()
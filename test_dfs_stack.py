@@ -1,6 +1,10 @@
+import contextlib
+import io
+import itertools
 import unittest
+import numpy as np
 import pandas as pd
-from dfs_stack import qb_wr_stack
+from dfs_stack import LineUp, Player, encode, qb_wr_stack, roster_pools, valid_lineups
 
 TEST_DF = pd.read_csv('test_utils/DKSalaries-test.csv')
 '''TEST_DF has various corruptions of data to be used for tests
@@ -23,6 +27,96 @@ class TestFunctions(unittest.TestCase):
     def test_qb_wr_stack_no_flex_error(self):
         with self.assertRaises(Exception):
             qb_wr_stack(TEST_DF, "ATL")
-    
+
+    def test_update_player_keeps_cache_in_sync(self):
+        players = [Player(f"P{i}", "WR", 5000 + i, 10.5 + i, "SF@WAS 12/31/2023 01:00PM ET", "SF")
+                   for i in range(10)]
+        lineup = LineUp(*players[:9])
+        lineup.salary, lineup.total, lineup.names
+        lineup.update_player("WR2", players[9])
+        fresh = LineUp(*lineup.players.values())
+        self.assertEqual(lineup.salary, fresh.salary)
+        self.assertAlmostEqual(lineup.total, fresh.total)
+        self.assertEqual(lineup.names, fresh.names)
+
+    def test_upgrade_with_budget_beats_single_best_swap(self):
+        teams = ["SF", "WAS", "DAL", "NYG", "PHI", "KC", "BUF", "MIA", "DET"]
+        slots = [("QB", 6000), ("RB", 5000), ("RB", 5000), ("WR", 5000), ("WR", 5000),
+                 ("WR", 5000), ("TE", 5000), ("WR", 5000), ("DST", 6000)]
+        lineup = LineUp(*[Player(f"P{i}", pos, sal, 10.0, "SF@WAS 12/31/2023 01:00PM ET", teams[i])
+                          for i, (pos, sal) in enumerate(slots)])
+        # $3000 left: one $3000 WR is the best single swap, a $1000 WR plus a $2000 TE is better
+        pool = pd.DataFrame({
+            "Name + ID": ["Big WR", "Cheap WR", "TE Up"],
+            "Position": ["WR", "WR", "TE"],
+            "Roster Position": ["WR/FLEX", "WR/FLEX", "TE/FLEX"],
+            "Salary": [8000, 6000, 7000],
+            "Proj DFS Total": [16.0, 14.0, 15.0],
+            "Game Info": "SF@WAS 12/31/2023 01:00PM ET",
+            "TeamAbbrev": ["LV", "LAC", "DEN"],
+        })
+        self.assertTrue(lineup.upgrade_with_budget(roster_pools(pool), lineup.players["WR1"]))
+        self.assertEqual(lineup.total, 99.0)
+        self.assertEqual(lineup.salary, 50000)
+        self.assertFalse(lineup.duplicates())
+
+    def test_upgrade_with_budget_matches_brute_force(self):
+        # small pools on distinct teams, so every combination the search can pick is a valid lineup
+        rng = np.random.default_rng(0)
+        positions = ["QB", "RB", "RB", "WR", "WR", "WR", "TE", "WR", "DST"]
+        roster = {"RB": "RB/FLEX", "WR": "WR/FLEX", "TE": "TE/FLEX"}
+        for case in range(25):
+            lineup = LineUp(*[Player(f"P{i}", pos, 100 * int(rng.integers(40, 60)), float(rng.integers(50, 150)) / 10,
+                                     "SF@WAS 12/31/2023 01:00PM ET", f"T{i}")
+                              for i, pos in enumerate(positions)])
+            pool_positions = ["RB"] * 3 + ["WR"] * 3 + ["TE"] * 2
+            pool = pd.DataFrame({
+                "Name + ID": [f"C{i}" for i in range(len(pool_positions))],
+                "Position": pool_positions,
+                "Roster Position": [roster[pos] for pos in pool_positions],
+                "Salary": 100 * rng.integers(40, 75, len(pool_positions)),
+                "Proj DFS Total": rng.integers(50, 250, len(pool_positions)) / 10,
+                "Game Info": "SF@WAS 12/31/2023 01:00PM ET",
+                "TeamAbbrev": [f"U{i}" for i in range(len(pool_positions))],
+            })
+            pools = roster_pools(pool)
+            wrt = lineup.players["WR1"]
+
+            options = []
+            for pos, player in lineup.players.items():
+                if pos == "DST" or player.position == "QB" or player.name == wrt.name:
+                    continue
+                options.append([None] + [(player, new) for new in pools[pos.rstrip("123")].players
+                                         if new.score > player.score and new.name not in lineup.names])
+            best = 0.0
+            for combo in itertools.product(*options):
+                swaps = [swap for swap in combo if swap is not None]
+                if len({new.name for _, new in swaps}) < len(swaps):
+                    continue
+                if lineup.salary + sum(new.salary - old.salary for old, new in swaps) > LineUp.SALARY_CAP:
+                    continue
+                best = max(best, sum(new.score - old.score for old, new in swaps))
+
+            before = lineup.total
+            with contextlib.redirect_stdout(io.StringIO()):
+                upgraded = lineup.upgrade_with_budget(pools, wrt)
+            self.assertEqual(upgraded, best > 0, f"case {case}")
+            self.assertAlmostEqual(lineup.total - before, best, msg=f"case {case}")
+            self.assertLessEqual(lineup.salary, LineUp.SALARY_CAP)
+
+    def test_valid_lineups_matches_is_valid(self):
+        # few teams and a small pool so duplicates, stacked teams and the cap all come up
+        rng = np.random.default_rng(0)
+        pool = [Player(f"P{i}", "WR", 4000 + 500 * (i % 7), 10.0, "SF@WAS 12/31/2023 01:00PM ET", f"T{i % 4}")
+                for i in range(15)]
+        lineups = [LineUp(*(pool[i] for i in rng.integers(0, len(pool), 9))) for _ in range(500)]
+        name_ids, team_ids = {}, {}
+        ids = np.array([encode(lineup.names, name_ids) for lineup in lineups])
+        teams = np.array([encode([p.team for p in lineup.players.values()], team_ids) for lineup in lineups])
+        salaries = np.array([lineup.salary for lineup in lineups])
+        expected = [lineup.is_valid() for lineup in lineups]
+        self.assertEqual(valid_lineups(salaries, ids, teams).tolist(), expected)
+        self.assertTrue(0 < sum(expected) < len(expected))
+
 if __name__ == '__main__':
     unittest.main()
\ No newline at end of file